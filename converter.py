@@ -1,43 +1,26 @@
+import copy
 import markdown
 import os
 import re
-from weasyprint import HTML
+from weasyprint import HTML, CSS
 
-def generate_toc(html_content):
+def index_headings(html_content):
     """
-    Generate a table of contents from HTML content
+    Assign a unique ID to every heading in HTML content
     
     Args:
         html_content (str): HTML content
         
     Returns:
-        tuple: (toc_html, modified_html_content) or empty string if no headings
+        tuple: (headings, modified_html_content) where headings is a list of
+        dicts with 'level', 'title' and 'id' keys in document order
     """
-    # Extract all headings with their IDs
     headings = []
     
     # Find all h1, h2, h3, h4, h5, h6 tags
     pattern = r'<h([1-6])>(.*?)</h\1>'
-    matches = re.findall(pattern, html_content)
-    
-    if not matches:
-        return ""  # No headings found
     
-    # If there's only one heading, we might not need a TOC
-    if len(matches) < 2:
-        # Still add the ID to the single heading for future reference
-        level, title = matches[0]
-        heading_id = title.lower().replace(' ', '-')
-        heading_id = re.sub(r'[^a-z0-9-]', '', heading_id)
-        
-        html_content = html_content.replace(
-            f'<h{level}>{title}</h{level}>',
-            f'<h{level} id="{heading_id}">{title}</h{level}>'
-        )
-        return "", html_content
-    
-    # Process all headings and add IDs
-    for level, title in matches:
+    for level, title in re.findall(pattern, html_content):
         # Create an ID from the title
         heading_id = title.lower().replace(' ', '-')
         # Clean up any non-alphanumeric characters
@@ -56,12 +39,35 @@ def generate_toc(html_content):
             'id': heading_id
         })
         
-        # Replace the heading in the original HTML with one that has an ID
+        # Replace only the first untagged occurrence so that repeated
+        # headings each keep their own ID
         html_content = html_content.replace(
             f'<h{level}>{title}</h{level}>',
-            f'<h{level} id="{heading_id}">{title}</h{level}>'
+            f'<h{level} id="{heading_id}">{title}</h{level}>',
+            1
         )
     
+    return headings, html_content
+
+def generate_toc(html_content):
+    """
+    Generate a table of contents from HTML content
+    
+    Args:
+        html_content (str): HTML content
+        
+    Returns:
+        tuple: (toc_html, modified_html_content) or empty string if no headings
+    """
+    headings, html_content = index_headings(html_content)
+    
+    if not headings:
+        return ""  # No headings found
+    
+    # If there's only one heading, we don't need a TOC but keep its ID
+    if len(headings) < 2:
+        return "", html_content
+    
     # Generate TOC HTML with proper nesting
     toc_html = '<div class="toc"><h2>Table of Contents</h2>'
     
@@ -105,17 +111,20 @@ def generate_toc(html_content):
     
     return toc_html, html_content
 
-def convert_md_to_pdf(md_content, output_path=None, include_toc=True):
+def render_document(md_content, include_toc=True):
     """
-    Convert markdown content to PDF
+    Convert markdown content to a laid out document without writing a PDF
+    
+    Layout is the most expensive step of the conversion, so the returned
+    document can be written any number of times (whole, by page range or with
+    different metadata) without laying it out again.
     
     Args:
         md_content (str): Markdown content
-        output_path (str, optional): Output file path
         include_toc (bool): Whether to include a table of contents
         
     Returns:
-        bytes or None: PDF content as bytes if output_path is None, otherwise None
+        RenderedDocument: The laid out document and its heading index
     """
     # Use a simpler approach with core extensions for better link compatibility
     extensions = [
@@ -181,12 +190,17 @@ def convert_md_to_pdf(md_content, output_path=None, include_toc=True):
         print(f"Warning: Could not process links in HTML: {e}")
         pass
     
+    # Index the headings; IDs match the ones generate_toc assigns
+    headings, indexed_html = index_headings(html_content)
+    
     # Generate TOC if requested
     toc_html = ""
     if include_toc:
         toc_result = generate_toc(html_content)
         if toc_result:  # Check if toc_result is not an empty string
             toc_html, html_content = toc_result
+    else:
+        html_content = indexed_html
     
     # Wrap HTML with optimized styling for PDF links
     styled_html = f"""
@@ -365,12 +379,10 @@ def convert_md_to_pdf(md_content, output_path=None, include_toc=True):
     # Try a more direct approach with WeasyPrint
     try:
         # First try the simpler approach that's known to work with basic links
-        pdf = HTML(string=styled_html).write_pdf()
+        document = HTML(string=styled_html).render()
     except Exception:
         # If that fails, try a more explicit approach
         try:
-            from weasyprint import HTML, CSS
-            
             # Create basic CSS for links
             link_css = CSS(string="""
                 a { color: blue; text-decoration: underline; }
@@ -380,20 +392,112 @@ def convert_md_to_pdf(md_content, output_path=None, include_toc=True):
             html = HTML(string=styled_html, base_url=".")
             
             # Render with explicit CSS
-            pdf = html.write_pdf(stylesheets=[link_css])
+            document = html.render(stylesheets=[link_css])
         except Exception as e:
             # If all else fails, use the most basic approach
             print(f"Warning: Using fallback PDF rendering due to: {e}")
-            pdf = HTML(string=styled_html).write_pdf()
+            document = HTML(string=styled_html).render()
+    
+    return RenderedDocument(document, headings)
+
+class RenderedDocument:
+    """
+    A laid out document that can be written to PDF without laying out again
     
-    # Save to file if output path is provided
-    if output_path:
-        with open(output_path, 'wb') as f:
-            f.write(pdf)
-        return None
+    Attributes:
+        document (weasyprint.Document): The rendered WeasyPrint document
+        headings (list): Heading dicts with 'level', 'title', 'id' and the
+            1-based 'page' they start on (None if the heading was not found)
+    """
+    
+    def __init__(self, document, headings):
+        self.document = document
+        
+        # Map each anchor to the first page it appears on
+        anchor_pages = {}
+        for number, page in enumerate(document.pages, start=1):
+            for anchor in page.anchors:
+                anchor_pages.setdefault(anchor, number)
+        
+        self.headings = [
+            dict(heading, page=anchor_pages.get(heading['id']))
+            for heading in headings
+        ]
     
-    # Return PDF content as bytes
-    return pdf
+    @property
+    def page_count(self):
+        """int: Number of pages in the document"""
+        return len(self.document.pages)
+    
+    def outline(self):
+        """
+        Map each heading ID to the page it starts on
+        
+        Returns:
+            dict: {heading_id: page_number} with 1-based page numbers
+        """
+        return {heading['id']: heading['page'] for heading in self.headings}
+    
+    def write_pdf(self, output_path=None, pages=None, metadata=None):
+        """
+        Write the document, or part of it, to PDF
+        
+        Args:
+            output_path (str, optional): Output file path
+            pages (iterable, optional): 1-based page numbers to include, e.g.
+                range(1, 4) for the first three pages; all pages if None
+            metadata (dict, optional): PDF metadata to override for this copy,
+                e.g. {'title': ..., 'authors': [...]}
+            
+        Returns:
+            bytes or None: PDF content as bytes if output_path is None, otherwise None
+        """
+        document = self.document
+        
+        if pages is not None:
+            selected = []
+            for number in pages:
+                if not 1 <= number <= self.page_count:
+                    raise ValueError(
+                        f"Page {number} out of range (1-{self.page_count})"
+                    )
+                selected.append(self.document.pages[number - 1])
+            document = document.copy(selected)
+        
+        if metadata:
+            # Copies share metadata with the original, so give this one its own
+            if document is self.document:
+                document = document.copy()
+            document.metadata = copy.copy(document.metadata)
+            for key, value in metadata.items():
+                if not hasattr(document.metadata, key):
+                    raise ValueError(f"Unknown PDF metadata field: {key}")
+                setattr(document.metadata, key, value)
+        
+        pdf = document.write_pdf()
+        
+        # Save to file if output path is provided
+        if output_path:
+            with open(output_path, 'wb') as f:
+                f.write(pdf)
+            return None
+        
+        # Return PDF content as bytes
+        return pdf
+
+def convert_md_to_pdf(md_content, output_path=None, include_toc=True):
+    """
+    Convert markdown content to PDF
+    
+    Args:
+        md_content (str): Markdown content
+        output_path (str, optional): Output file path
+        include_toc (bool): Whether to include a table of contents
+        
+    Returns:
+        bytes or None: PDF content as bytes if output_path is None, otherwise None
+    """
+    return render_document(md_content, include_toc).write_pdf(output_path)
 
 if __name__ == "__main__":
     import sys
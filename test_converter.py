@@ -6,7 +6,7 @@ This module contains basic tests for the converter functionality.
 
 import os
 import unittest
-from converter import convert_md_to_pdf
+from converter import convert_md_to_pdf, index_headings, render_document
 
 class TestConverter(unittest.TestCase):
     """Test cases for the converter module."""
@@ -48,6 +48,35 @@ Content for subsection 2.1
 """
         result = convert_md_to_pdf(markdown_content, self.output_path, include_toc=True)
         self.assertTrue(os.path.exists(self.output_path))
+    
+    def test_index_headings_unique_ids(self):
+        """Test that repeated headings each get their own ID."""
+        headings, html = index_headings("<h2>Notes</h2><p>a</p><h2>Notes</h2>")
+        self.assertEqual([h['id'] for h in headings], ['notes', 'notes-1'])
+        self.assertIn('<h2 id="notes">', html)
+        self.assertIn('<h2 id="notes-1">', html)
+    
+    def test_render_document_outline(self):
+        """Test that the rendered document maps headings to pages."""
+        markdown_content = "# First\n\nText\n\n## Second\n\nMore text"
+        rendered = render_document(markdown_content, include_toc=True)
+        # The TOC forces a page break, so the content starts on page 2
+        self.assertEqual(rendered.page_count, 2)
+        self.assertEqual(rendered.outline(), {'first': 2, 'second': 2})
+    
+    def test_write_page_range_and_metadata(self):
+        """Test writing selected pages and metadata from one layout."""
+        markdown_content = "# First\n\nText\n\n## Second\n\nMore text"
+        rendered = render_document(markdown_content, include_toc=True)
+        full = rendered.write_pdf()
+        partial = rendered.write_pdf(pages=[2], metadata={'title': 'Excerpt'})
+        self.assertTrue(full.startswith(b'%PDF'))
+        self.assertTrue(partial.startswith(b'%PDF'))
+        self.assertIn(b'Excerpt', partial)
+        # The original document keeps its own metadata
+        self.assertIsNone(rendered.document.metadata.title)
+        with self.assertRaises(ValueError):
+            rendered.write_pdf(pages=[3])
 
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file